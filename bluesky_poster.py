@@ -1,22 +1,75 @@
-from atproto import Client
+from atproto import Client, SessionEvent
+from atproto.exceptions import UnauthorizedError, LoginRequiredError
 from typing import Optional, Dict
+import grapheme
+import hashlib
+import libipld
+import os
+import random
 import re
+import threading
+import time
+
+# Sortable base32 alphabet used for ATProto record keys (TIDs)
+_TID_ALPHABET = '234567abcdefghijklmnopqrstuvwxyz'
+
+# CIDv1 + dag-cbor codec + sha2-256 multihash prefix
+_CID_PREFIX = bytes([0x01, 0x71, 0x12, 0x20])
+
+
+def _generate_tid() -> str:
+    """Generate a timestamp-based record key, as the PDS would"""
+    value = (time.time_ns() // 1000) << 10 | random.getrandbits(10)
+    return ''.join(_TID_ALPHABET[(value >> shift) & 31] for shift in range(60, -1, -5))
+
+
+def _record_cid(record: Dict) -> str:
+    """Compute the CID the PDS will assign to a record"""
+    return libipld.encode_cid(_CID_PREFIX + hashlib.sha256(libipld.encode_dag_cbor(record)).digest())
+
 
 class BlueskyPoster:
     """Post executive order announcements to Bluesky"""
     
+    # Only reused on a persistent host; hosted add-on runners start fresh each run
+    SESSION_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'eo-tracker')
+    SESSION_TTL = 6 * 24 * 60 * 60  # Re-login once a cached session is this old
+    MAX_POST_GRAPHEMES = 300
+    TITLE_PREFIX = "🆕 Executive Order: "
+    HASHTAGS = "#ExecutiveOrder #WhiteHouse #GovDocs #Transparency"
+    SHORT_HASHTAGS = "#ExecutiveOrder"
+    MIN_TITLE_GRAPHEMES = 50
+    _TITLE_PREFIX_LENGTH = grapheme.length(TITLE_PREFIX)
+    
     def __init__(self, handle: str, password: str):
         """Initialize Bluesky client"""
         self.handle = handle
         self.password = password
         self.client = None
         self.authenticated = False
+        self._did = None
+        self._auth_lock = threading.Lock()
+        handle_hash = hashlib.md5(handle.encode('utf-8')).hexdigest()
+        self.session_path = os.path.join(self.SESSION_DIR, f"bsky-session-{handle_hash}")
     
     def authenticate(self) -> bool:
-        """Authenticate with Bluesky"""
+        """Authenticate with Bluesky, resuming a cached session when possible"""
+        session_string = self._load_session()
+        if session_string:
+            try:
+                self.client = self._create_client()
+                self.client.login(session_string=session_string)
+                self._did = self.client.me.did
+                self.authenticated = True
+                return True
+            except Exception as e:
+                print(f"Cached Bluesky session rejected, logging in again: {e}")
+                self._clear_session()
+        
         try:
-            self.client = Client()
+            self.client = self._create_client()
             self.client.login(self.handle, self.password)
+            self._did = self.client.me.did
             self.authenticated = True
             return True
         except Exception as e:
@@ -24,6 +77,51 @@ class BlueskyPoster:
             self.authenticated = False
             return False
     
+    def _ensure_authenticated(self) -> bool:
+        """Authenticate once, even when called from several threads"""
+        with self._auth_lock:
+            if self.authenticated:
+                return True
+            return self.authenticate()
+    
+    def _create_client(self) -> Client:
+        """Create a client that persists its session whenever it changes"""
+        client = Client()
+        client.on_session_change(self._on_session_change)
+        return client
+    
+    def _on_session_change(self, event: SessionEvent, session) -> None:
+        """Store new and refreshed sessions for the next run"""
+        if event in (SessionEvent.CREATE, SessionEvent.REFRESH):
+            self._save_session(session.encode())
+    
+    def _load_session(self) -> Optional[str]:
+        """Read the cached session string unless it is missing or stale"""
+        try:
+            if time.time() - os.path.getmtime(self.session_path) > self.SESSION_TTL:
+                return None
+            with open(self.session_path, 'r') as f:
+                return f.read().strip() or None
+        except OSError:
+            return None
+    
+    def _save_session(self, session_string: str):
+        """Write the session string to the cache, readable only by this user"""
+        try:
+            os.makedirs(self.SESSION_DIR, mode=0o700, exist_ok=True)
+            fd = os.open(self.session_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'w') as f:
+                f.write(session_string)
+        except OSError as e:
+            print(f"Could not cache Bluesky session: {e}")
+    
+    def _clear_session(self):
+        """Remove the cached session so the next login uses the password"""
+        try:
+            os.remove(self.session_path)
+        except OSError:
+            pass
+    
     def create_post_text(self, order_data: Dict, doc_url: str) -> str:
         """Create the post text for an executive order"""
         # Extract key information
@@ -31,46 +129,50 @@ class BlueskyPoster:
         order_number = order_data.get('order_number')
         original_url = order_data.get('url', '')
         
-        # Create post text
-        post_lines = [
-            "🆕 Executive Order: " + self._truncate_title(title, 100)
-        ]
-        
+        # Everything after the title line
+        detail_lines = []
         if order_number:
-            post_lines.append(f"📄 EO-{order_number}")
-        
-        post_lines.extend([
-            "",
+            detail_lines.append(f"📄 EO-{order_number}")
+        detail_lines.extend([
             "Full text archived:",
-            f"🔗 DocumentCloud: {doc_url}",
-            f"🔗 Original: {original_url}" if original_url else "",
-            "",
-            "#ExecutiveOrder #WhiteHouse #GovDocs #Transparency"
+            f"🔗 DocumentCloud: {doc_url}"
         ])
+        original_line = [f"🔗 Original: {original_url}"] if original_url else []
         
-        # Join and ensure we're under character limit
-        post_text = '\n'.join(line for line in post_lines if line)
+        # Bluesky limits posts to 300 graphemes; give the title whatever is
+        # left, shortening then dropping the hashtags (and as a last resort
+        # the original link) rather than squeezing it below MIN_TITLE_GRAPHEMES
+        min_title = min(grapheme.length(title), self.MIN_TITLE_GRAPHEMES)
+        for optional_lines in (
+            original_line + [self.HASHTAGS],
+            original_line + [self.SHORT_HASHTAGS],
+            original_line,
+            []
+        ):
+            lines = detail_lines + optional_lines
+            title_budget = (self.MAX_POST_GRAPHEMES - self._TITLE_PREFIX_LENGTH
+                            - sum(grapheme.length(line) + 1 for line in lines))
+            if title_budget >= min_title:
+                break
         
-        # Bluesky has a 300 character limit
-        if len(post_text) > 300:
-            # Truncate the title more aggressively
-            short_title = self._truncate_title(title, 50)
-            post_lines[0] = "🆕 Executive Order: " + short_title
-            post_text = '\n'.join(line for line in post_lines if line)
-            
-            # If still too long, remove hashtags
-            if len(post_text) > 300:
-                post_text = post_text.replace("#ExecutiveOrder #WhiteHouse #GovDocs #Transparency", "#ExecutiveOrder")
+        post_lines = [self.TITLE_PREFIX + self._truncate_title(title, min(100, title_budget))] + lines
+        
+        # Only an oversized DocumentCloud URL gets here; drop whole lines
+        # rather than cut a link in half
+        while len(post_lines) > 1 and grapheme.length('\n'.join(post_lines)) > self.MAX_POST_GRAPHEMES:
+            post_lines.pop()
         
-        return post_text[:300]  # Ensure we don't exceed limit
+        return grapheme.slice('\n'.join(post_lines), 0, self.MAX_POST_GRAPHEMES)  # Ensure we don't exceed limit
     
     def _truncate_title(self, title: str, max_length: int) -> str:
-        """Truncate title intelligently"""
-        if len(title) <= max_length:
+        """Truncate title intelligently to at most max_length graphemes"""
+        if grapheme.length(title) <= max_length:
             return title
+        if max_length <= 3:
+            return ''
         
         # Try to truncate at a word boundary
-        truncated = title[:max_length-3]
+        truncated = grapheme.slice(title, 0, max_length - 3)
         last_space = truncated.rfind(' ')
         if last_space > max_length * 0.7:  # Only use word boundary if it's not too short
             truncated = truncated[:last_space]
@@ -79,16 +181,15 @@ class BlueskyPoster:
     
     def post_order(self, order_data: Dict, doc_url: str) -> Optional[Dict]:
         """Post an executive order announcement to Bluesky"""
-        if not self.authenticated:
-            if not self.authenticate():
-                return None
+        if not self._ensure_authenticated():
+            return None
         
         try:
             post_text = self.create_post_text(order_data, doc_url)
             
             # Create the post
             response = self.client.com.atproto.repo.create_record(
-                repo=self.client.me.did,
+                repo=self._did,
                 collection='app.bsky.feed.post',
                 record={
                     'text': post_text,
@@ -104,6 +205,14 @@ class BlueskyPoster:
                 'post_text': post_text
             }
             
+        except (UnauthorizedError, LoginRequiredError) as e:
+            print(f"Bluesky session no longer valid: {e}")
+            self._clear_session()
+            self.authenticated = False
+            return {
+                'success': False,
+                'error': str(e)
+            }
         except Exception as e:
             print(f"Failed to post to Bluesky: {e}")
             return {
@@ -113,50 +222,89 @@ class BlueskyPoster:
     
     def create_thread(self, order_data: Dict, doc_url: str, additional_info: str = None) -> Optional[Dict]:
         """Create a thread with more detailed information"""
-        if not self.authenticated:
-            if not self.authenticate():
-                return None
+        if not self._ensure_authenticated():
+            return None
+        
+        if not additional_info:
+            return self.post_order(order_data, doc_url)
         
         try:
-            # First post
-            main_post = self.post_order(order_data, doc_url)
-            if not main_post or not main_post.get('success'):
-                return main_post
+            post_text = self.create_post_text(order_data, doc_url)
+            reply_text = grapheme.slice(additional_info, 0, self.MAX_POST_GRAPHEMES)
+            created_at = self.client.get_current_time_iso()
             
-            # Additional post with more details if provided
-            if additional_info:
-                reply_text = additional_info[:300]
-                
-                reply_response = self.client.com.atproto.repo.create_record(
-                    repo=self.client.me.did,
-                    collection='app.bsky.feed.post',
-                    record={
-                        'text': reply_text,
-                        'createdAt': self.client.get_current_time_iso(),
-                        'reply': {
-                            'root': {
-                                'uri': main_post['uri'],
-                                'cid': main_post['cid']
-                            },
-                            'parent': {
-                                'uri': main_post['uri'],
-                                'cid': main_post['cid']
-                            }
-                        },
-                        '$type': 'app.bsky.feed.post'
+            # The reply has to reference the main post before it exists, so
+            # pick its record key and compute its CID locally
+            main_record = {
+                'text': post_text,
+                'createdAt': created_at,
+                '$type': 'app.bsky.feed.post'
+            }
+            main_ref = {
+                'uri': f"at://{self._did}/app.bsky.feed.post/{_generate_tid()}",
+                'cid': _record_cid(main_record)
+            }
+            reply_record = {
+                'text': reply_text,
+                'createdAt': created_at,
+                'reply': {
+                    'root': main_ref,
+                    'parent': main_ref
+                },
+                '$type': 'app.bsky.feed.post'
+            }
+            
+            # Create both posts in a single commit
+            response = self.client.com.atproto.repo.apply_writes(data={
+                'repo': self._did,
+                'writes': [
+                    {
+                        '$type': 'com.atproto.repo.applyWrites#create',
+                        'collection': 'app.bsky.feed.post',
+                        'rkey': main_ref['uri'].rsplit('/', 1)[1],
+                        'value': main_record
+                    },
+                    {
+                        '$type': 'com.atproto.repo.applyWrites#create',
+                        'collection': 'app.bsky.feed.post',
+                        'value': reply_record
                     }
-                )
-                
-                return {
+                ]
+            })
+            
+            main_post = {
+                'success': True,
+                'uri': main_ref['uri'],
+                'cid': main_ref['cid'],
+                'post_text': post_text
+            }
+            reply_post = None
+            
+            # Per-write results are optional in the response; both posts are
+            # committed either way, so fall back to the locally computed refs
+            results = response.results or []
+            if len(results) == 2:
+                main_result, reply_result = results
+                main_post.update(uri=main_result.uri, cid=main_result.cid)
+                reply_post = {
                     'success': True,
-                    'main_post': main_post,
-                    'reply_post': {
-                        'uri': reply_response.uri,
-                        'cid': reply_response.cid
-                    }
+                    'uri': reply_result.uri,
+                    'cid': reply_result.cid
                 }
+                
+                # The reply points at the CID computed here; if the PDS stored
+                # the main post differently, the reply's thread link is dangling
+                if main_result.cid != main_ref['cid']:
+                    error = (f"Bluesky stored the main post with CID {main_result.cid}, "
+                             f"expected {main_ref['cid']}; the reply is not threaded")
+                    print(error)
+                    reply_post.update(success=False, error=error)
             
-            return main_post
+            return {
+                'success': True,
+                'main_post': main_post,
+                'reply_post': reply_post
+            }
             
         except Exception as e:
             print(f"Failed to create thread on Bluesky: {e}")
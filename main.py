@@ -1,9 +1,13 @@
 from documentcloud.addon import AddOn
+from documentcloud.constants import BULK_LIMIT
+from documentcloud.documents import Document
 from documentcloud.exceptions import APIError
+from documentcloud.toolbox import requests_retry_session
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta
+from io import BytesIO
 import os
-import tempfile
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 
 from scraper import WhiteHouseScraper
 from pdf_generator import PDFGenerator
@@ -14,6 +18,9 @@ from bluesky_poster import BlueskyPoster
 class ExecutiveOrdersMonitor(AddOn):
     """Monitor White House website for new Executive Orders and archive them"""
     
+    # Default cap on orders archived/posted at once; override with EO_MAX_DOP
+    MAX_WORKERS = 8
+    
     def main(self):
         """Main execution method"""
         self.set_message("Starting Executive Orders Monitor...")
@@ -27,6 +34,7 @@ class ExecutiveOrdersMonitor(AddOn):
         # Get configuration
         include_proclamations = self.data.get('include_proclamations', False)
         archive_to_ia = self.data.get('archive_to_ia', True)
+        max_workers = self._max_workers()
         
         # Initialize Bluesky if credentials provided
         bluesky_client = None
@@ -39,58 +47,83 @@ class ExecutiveOrdersMonitor(AddOn):
         try:
             # Scrape current orders
             self.set_message("Scraping White House Presidential Actions page...")
-            all_orders = self.scraper.scrape_recent_orders(include_proclamations)
+            validators = self.state_manager.get_listing_validators(include_proclamations)
+            listing_ids = set()
+            
+            def is_known(order_id: str) -> bool:
+                # Note every listed order, so cleanup keeps the ones still shown
+                listing_ids.add(order_id)
+                return self.state_manager.is_order_processed(order_id)
+            
+            all_orders = self.scraper.scrape_recent_orders(
+                include_proclamations,
+                validators,
+                is_known=is_known
+            )
             
             # Filter to only new orders
             new_orders = self.state_manager.get_new_orders(all_orders)
             
             if not new_orders:
                 self.set_message("No new executive orders found")
+                self.state_manager.set_listing_validators(validators, include_proclamations)
                 self.state_manager.save_state()
                 return
             
             self.set_message(f"Found {len(new_orders)} new executive order(s)")
             
-            # Process each new order
-            processed_count = 0
+            # Generate a PDF for each new order
+            pending_uploads = []
             for i, order in enumerate(new_orders):
                 try:
-                    self.set_message(f"Processing order {i+1}/{len(new_orders)}: {order['title']}")
-                    
-                    # Generate PDF
-                    with tempfile.NamedTemporaryFile(suffix='.pdf', delete=False) as tmp_file:
-                        pdf_path = tmp_file.name
-                        self.pdf_generator.generate_pdf(order, pdf_path)
-                    
-                    # Upload to DocumentCloud
-                    doc = self._upload_to_documentcloud(order, pdf_path)
-                    
-                    # Clean up temp file
-                    os.unlink(pdf_path)
-                    
-                    if doc:
-                        # Archive to Internet Archive if enabled
-                        if archive_to_ia:
-                            self._archive_to_internet_archive(doc)
-                        
-                        # Post to Bluesky if configured
-                        if bluesky_client and not self.state_manager.is_posted_to_bluesky(order['id']):
-                            doc_url = doc.canonical_url
-                            post_result = bluesky_client.post_order(order, doc_url)
-                            if post_result and post_result.get('success'):
-                                self.state_manager.mark_posted_to_bluesky(order['id'])
-                                print(f"Posted to Bluesky: {post_result.get('uri')}")
-                        
-                        # Mark as processed
-                        self.state_manager.mark_order_processed(order['id'])
-                        processed_count += 1
-                    
+                    self.set_message(f"Generating PDF {i+1}/{len(new_orders)}: {order['title']}")
+                    pending_uploads.append((order, self.pdf_generator.generate_pdf(order)))
                 except Exception as e:
-                    print(f"Error processing order {order['id']}: {e}")
+                    print(f"Error generating PDF for order {order['id']}: {e}")
                     self.set_message(f"Error processing order: {str(e)}")
-                    continue
+            
+            # Upload all PDFs to DocumentCloud in bulk
+            self.set_message(f"Uploading {len(pending_uploads)} document(s) to DocumentCloud...")
+            docs = self._upload_batch_to_documentcloud(pending_uploads)
+            
+            # Archive and announce uploaded orders in parallel
+            uploaded = [(order, docs[order['id']]) for order, _ in pending_uploads if order['id'] in docs]
+            processed_ids = []
+            posted_ids = []
+            if uploaded:
+                with ThreadPoolExecutor(max_workers=min(max_workers, len(uploaded))) as executor:
+                    futures = {
+                        executor.submit(self._process_one, order, doc, bluesky_client, archive_to_ia): order
+                        for order, doc in uploaded
+                    }
+                    for future in as_completed(futures):
+                        order = futures[future]
+                        try:
+                            order_id, post_result = future.result()
+                        except Exception as e:
+                            print(f"Error processing order {order['id']}: {e}")
+                            self.set_message(f"Error processing order: {str(e)}")
+                            continue
+                        
+                        if post_result and post_result.get('success'):
+                            posted_ids.append(order_id)
+                            print(f"Posted to Bluesky: {post_result.get('uri')}")
+                        processed_ids.append(order_id)
+            
+            # Mark as processed
+            self.state_manager.mark_posted_to_bluesky_batch(posted_ids)
+            self.state_manager.mark_orders_processed(processed_ids)
+            processed_count = len(processed_ids)
+            
+            # Only skip an unchanged listing, or orders older than these,
+            # next time if nothing here needs a retry
+            if processed_count == len(new_orders):
+                self.state_manager.set_listing_validators(validators, include_proclamations)
+                for order in new_orders:
+                    self.state_manager.update_last_order_date(order.get('date_str'))
             
             # Save state
+            self.state_manager.cleanup_old_entries(keep_ids=listing_ids)
             self.state_manager.save_state()
             
             # Generate summary
@@ -108,40 +141,178 @@ class ExecutiveOrdersMonitor(AddOn):
             self.set_message(f"Error: {str(e)}")
             raise
     
-    def _upload_to_documentcloud(self, order: Dict, pdf_path: str) -> Optional[object]:
-        """Upload PDF to DocumentCloud"""
+    def _max_workers(self) -> int:
+        """Read the EO_MAX_DOP override, or MAX_WORKERS if it is not a positive integer"""
+        value = os.environ.get('EO_MAX_DOP')
+        if value is None:
+            return self.MAX_WORKERS
         try:
-            # Prepare document data
-            title = order.get('title', 'Executive Order')
-            if order.get('order_number'):
-                title = f"EO {order['order_number']}: {title}"
-            
-            # Create source string
-            source = "White House"
-            if order.get('date_str'):
-                source += f" - {order['date_str']}"
-            
-            # Prepare data for upload
-            doc_data = {
-                'title': title,
-                'source': source,
-                'description': f"Executive Order scraped from {order.get('url', 'whitehouse.gov')}",
-                'language': 'eng',
-                'data': {
-                    'order_id': order['id'],
-                    'order_number': order.get('order_number'),
-                    'original_url': order.get('url'),
-                    'scrape_date': datetime.utcnow().isoformat(),
-                    'order_type': order.get('type', 'executive_order')
-                }
+            max_workers = int(value)
+        except ValueError:
+            max_workers = 0
+        if max_workers < 1:
+            print(f"Ignoring invalid EO_MAX_DOP {value!r}, using {self.MAX_WORKERS}")
+            return self.MAX_WORKERS
+        return max_workers
+    
+    def _process_one(self, order: Dict, doc, bluesky_client: Optional[BlueskyPoster],
+                     archive_to_ia: bool) -> Tuple[str, Optional[Dict]]:
+        """Archive and announce one uploaded order on a worker thread"""
+        # Only reads state; the caller records the returned Bluesky post result
+        # Archive to Internet Archive if enabled
+        if archive_to_ia:
+            self._archive_to_internet_archive(doc)
+        
+        # Post to Bluesky if configured
+        post_result = None
+        if bluesky_client and not self.state_manager.is_posted_to_bluesky(order['id']):
+            post_result = bluesky_client.post_order(order, doc.canonical_url)
+        
+        return order['id'], post_result
+    
+    def _document_data(self, order: Dict) -> Dict:
+        """Build the DocumentCloud upload parameters for an order"""
+        title = order.get('title', 'Executive Order')
+        if order.get('order_number'):
+            title = f"EO {order['order_number']}: {title}"
+        
+        # Create source string
+        source = "White House"
+        if order.get('date_str'):
+            source += f" - {order['date_str']}"
+        
+        return {
+            'title': title,
+            'source': source,
+            'description': f"Executive Order scraped from {order.get('url', 'whitehouse.gov')}",
+            'language': 'eng',
+            'data': {
+                'order_id': order['id'],
+                'order_number': order.get('order_number'),
+                'original_url': order.get('url'),
+                'scrape_date': datetime.utcnow().isoformat(),
+                'order_type': order.get('type', 'executive_order')
             }
+        }
+    
+    def _upload_batch_to_documentcloud(self, pending_uploads: List[Tuple[Dict, bytes]]) -> Dict[str, object]:
+        """Upload PDFs in bulk and return the uploaded documents keyed by order ID"""
+        # Orders whose document couldn't be created in bulk are uploaded one
+        # at a time; documents that were created but couldn't be finished are
+        # deleted, so the next run retries them without leaving duplicates
+        docs = {}
+        for start in range(0, len(pending_uploads), BULK_LIMIT):
+            group = pending_uploads[start:start + BULK_LIMIT]
+            
+            # Create all documents in one request
+            try:
+                response = self.client.post(
+                    "documents/",
+                    json=[self._document_data(order) for order, _ in group]
+                )
+                created = response.json()
+            except Exception as e:
+                print(f"Bulk create failed, uploading individually: {e}")
+                created = []
+            
+            # Match documents to orders by the order ID sent in their data,
+            # rather than relying on the response order
+            group_ids = {order['id'] for order, _ in group}
+            created_by_id = {}
+            unmatched_ids = []
+            try:
+                for doc_json in created:
+                    # DocumentCloud stores data values as lists of strings
+                    order_id = (doc_json.get('data') or {}).get('order_id')
+                    if isinstance(order_id, list):
+                        order_id = order_id[0] if order_id else None
+                    if order_id not in group_ids or order_id in created_by_id:
+                        unmatched_ids.append(doc_json['id'])
+                    else:
+                        created_by_id[order_id] = doc_json
+            except Exception as e:
+                print(f"Unexpected bulk create response, uploading individually: {e}")
+                created_by_id = {}
+                unmatched_ids = [
+                    doc_json['id'] for doc_json in created
+                    if isinstance(doc_json, dict) and 'id' in doc_json
+                ] if isinstance(created, list) else []
+            for doc_id in unmatched_ids:
+                self._delete_document(doc_id)
             
-            # Upload the document
-            with open(pdf_path, 'rb') as pdf_file:
-                doc = self.client.documents.upload(
-                    pdf_file,
-                    **doc_data
+            # Upload each file to its presigned URL
+            uploaded = []
+            for order, pdf_bytes in group:
+                doc_json = created_by_id.get(order['id'])
+                if doc_json is None:
+                    doc = self._upload_to_documentcloud(order, pdf_bytes)
+                    if doc:
+                        docs[order['id']] = doc
+                    continue
+                
+                try:
+                    doc = Document(self.client, doc_json)
+                    put_response = requests_retry_session().put(
+                        doc_json['presigned_url'],
+                        data=pdf_bytes
+                    )
+                    self.client.raise_for_status(put_response)
+                except Exception as e:
+                    print(f"Error uploading file for order {order['id']}: {e}")
+                    self._delete_document(doc_json['id'])
+                    continue
+                uploaded.append((order, doc))
+            
+            if not uploaded:
+                continue
+            
+            # Start processing all documents in one request, or one at a
+            # time if that fails
+            try:
+                self.client.post(
+                    "documents/process/",
+                    json=[{'id': doc.id} for _, doc in uploaded]
                 )
+            except Exception as e:
+                print(f"Bulk process failed, processing individually: {e}")
+                uploaded = [(order, doc) for order, doc in uploaded if self._process_document(doc)]
+            
+            for order, doc in uploaded:
+                print(f"Uploaded document: {doc.id} - {doc.title}")
+                docs[order['id']] = doc
+        
+        return docs
+    
+    def _process_document(self, doc) -> bool:
+        """Start processing an uploaded document, deleting it on failure"""
+        try:
+            doc.process()
+            return True
+        except Exception as e:
+            print(f"Error processing document {doc.id}: {e}")
+            self._delete_document(doc.id)
+            return False
+    
+    def _delete_document(self, doc_id):
+        """Delete a document that was created but not finished"""
+        try:
+            self.client.delete(f"documents/{doc_id}/")
+        except Exception as e:
+            print(f"Error deleting unfinished document {doc_id}: {e}")
+    
+    def _upload_to_documentcloud(self, order: Dict, pdf_bytes: bytes) -> Optional[object]:
+        """Upload PDF to DocumentCloud"""
+        try:
+            doc_data = self._document_data(order)
+            
+            # Upload the document straight from memory; the client
+            # reads the file name from the file object
+            pdf_file = BytesIO(pdf_bytes)
+            pdf_file.name = f"{order['id']}.pdf"
+            doc = self.client.documents.upload(
+                pdf_file,
+                **doc_data
+            )
             
             print(f"Uploaded document: {doc.id} - {doc.title}")
             return doc
@@ -1,79 +1,98 @@
 from reportlab.lib.pagesizes import letter
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, PageBreak
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, PageBreak, HRFlowable
 from reportlab.platypus import Table, TableStyle
 from reportlab.lib import colors
 from reportlab.lib.enums import TA_CENTER, TA_JUSTIFY
 from datetime import datetime
 import os
+import re
 from typing import Dict, Optional
 from io import BytesIO
-from PyPDF2 import PdfWriter, PdfReader
+
+_PARA_SPLIT_RE = re.compile(r'\n\n+')
+_HEADER_RE = re.compile(r'[IVX]+\.\s')
+_HEADER_MAX_LENGTH = 120
+
+
+def _build_styles():
+    """Build the stylesheet with the custom paragraph styles"""
+    styles = getSampleStyleSheet()
+    
+    # Title style
+    styles.add(ParagraphStyle(
+        name='OrderTitle',
+        parent=styles['Heading1'],
+        fontSize=18,
+        textColor=colors.HexColor('#000080'),
+        spaceAfter=12,
+        alignment=TA_CENTER
+    ))
+    
+    # Metadata style
+    styles.add(ParagraphStyle(
+        name='Metadata',
+        parent=styles['Normal'],
+        fontSize=10,
+        textColor=colors.gray,
+        spaceAfter=6
+    ))
+    
+    # Body text style
+    styles.add(ParagraphStyle(
+        name='OrderBody',
+        parent=styles['Normal'],
+        fontSize=11,
+        alignment=TA_JUSTIFY,
+        spaceAfter=12,
+        leading=14
+    ))
+    
+    # Footer style
+    styles.add(ParagraphStyle(
+        name='Footer',
+        parent=styles['Normal'],
+        fontSize=8,
+        textColor=colors.gray,
+        alignment=TA_CENTER
+    ))
+    
+    return styles
+
 
 class PDFGenerator:
     """Generate PDFs for Executive Orders with metadata"""
     
-    def __init__(self):
-        self.styles = getSampleStyleSheet()
-        self._setup_custom_styles()
+    # Styles are read-only during a build, so one stylesheet serves every instance
+    styles = _build_styles()
     
-    def _setup_custom_styles(self):
-        """Set up custom paragraph styles"""
-        # Title style
-        self.styles.add(ParagraphStyle(
-            name='OrderTitle',
-            parent=self.styles['Heading1'],
-            fontSize=18,
-            textColor=colors.HexColor('#000080'),
-            spaceAfter=12,
-            alignment=TA_CENTER
-        ))
-        
-        # Metadata style
-        self.styles.add(ParagraphStyle(
-            name='Metadata',
-            parent=self.styles['Normal'],
-            fontSize=10,
-            textColor=colors.gray,
-            spaceAfter=6
-        ))
-        
-        # Body text style
-        self.styles.add(ParagraphStyle(
-            name='OrderBody',
-            parent=self.styles['Normal'],
-            fontSize=11,
-            alignment=TA_JUSTIFY,
-            spaceAfter=12,
-            leading=14
-        ))
-        
-        # Footer style
-        self.styles.add(ParagraphStyle(
-            name='Footer',
-            parent=self.styles['Normal'],
-            fontSize=8,
-            textColor=colors.gray,
-            alignment=TA_CENTER
-        ))
-    
-    def generate_pdf(self, order_data: Dict, output_path: Optional[str] = None) -> bytes:
-        """Generate a PDF for an executive order"""
+    def generate_pdf(self, order_data: Dict, output_path: Optional[str] = None) -> Optional[bytes]:
+        """Generate a PDF for an executive order, returning the bytes unless output_path is given"""
         # Create PDF in memory if no output path specified
         if output_path:
             pdf_buffer = output_path
         else:
             pdf_buffer = BytesIO()
         
-        # Create document
+        keywords = 'executive order, white house, presidential action'
+        if order_data.get('order_number'):
+            keywords += f", EO {order_data['order_number']}"
+        
+        # Create document, with the PDF metadata written during the build
         doc = SimpleDocTemplate(
             pdf_buffer,
             pagesize=letter,
             rightMargin=72,
             leftMargin=72,
             topMargin=72,
-            bottomMargin=72
+            bottomMargin=72,
+            title=order_data.get('title', 'Executive Order'),
+            author='The White House',
+            subject='Executive Order',
+            keywords=keywords,
+            creator='DocumentCloud Executive Orders Monitor',
+            producer='DocumentCloud / ReportLab'
         )
         
         # Container for the 'Flowable' objects
@@ -122,30 +141,31 @@ class PDFGenerator:
             elements.append(Spacer(1, 0.3*inch))
         
         # Add separator line
-        elements.append(Paragraph('_' * 80, self.styles['Normal']))
+        elements.append(self._separator())
         elements.append(Spacer(1, 0.2*inch))
         
         # Add main content
         full_text = order_data.get('full_text', 'No content available.')
         
         # Split text into paragraphs and process
-        paragraphs = full_text.split('\n\n')
+        paragraphs = _PARA_SPLIT_RE.split(full_text)
+        heading_style = self.styles['Heading3']
+        body_style = self.styles['OrderBody']
         for para in paragraphs:
             if para.strip():
                 # Clean up the paragraph
                 para = para.strip()
                 
-                # Check if it's a section header (all caps or starts with Roman numerals)
-                if para.isupper() or para.startswith(('I.', 'II.', 'III.', 'IV.', 'V.')):
-                    elements.append(Paragraph(para, self.styles['Heading3']))
-                else:
-                    elements.append(Paragraph(para, self.styles['OrderBody']))
+                # Check if it's a section header (short, and all caps or starts
+                # with Roman numerals); long paragraphs are never headers
+                is_header = len(para) < _HEADER_MAX_LENGTH and (para.isupper() or _HEADER_RE.match(para))
+                elements.append(Paragraph(para, heading_style if is_header else body_style))
                 
                 elements.append(Spacer(1, 0.1*inch))
         
         # Add footer
         elements.append(Spacer(1, 0.5*inch))
-        elements.append(Paragraph('_' * 80, self.styles['Normal']))
+        elements.append(self._separator())
         elements.append(Spacer(1, 0.1*inch))
         
         footer_text = (
@@ -158,47 +178,10 @@ class PDFGenerator:
         # Build PDF
         doc.build(elements)
         
-        # Add metadata to PDF
-        if not output_path:
-            pdf_buffer.seek(0)
-            pdf_with_metadata = self._add_pdf_metadata(pdf_buffer, order_data)
-            return pdf_with_metadata
-        else:
-            # If file was written to disk, read it back and add metadata
-            with open(output_path, 'rb') as f:
-                pdf_with_metadata = self._add_pdf_metadata(f, order_data)
-            with open(output_path, 'wb') as f:
-                f.write(pdf_with_metadata)
-            return pdf_with_metadata
+        if output_path:
+            return None
+        return pdf_buffer.getvalue()
     
-    def _add_pdf_metadata(self, pdf_file, order_data: Dict) -> bytes:
-        """Add metadata to PDF file"""
-        reader = PdfReader(pdf_file)
-        writer = PdfWriter()
-        
-        # Copy all pages
-        for page in reader.pages:
-            writer.add_page(page)
-        
-        # Add metadata
-        metadata = {
-            '/Title': order_data.get('title', 'Executive Order'),
-            '/Author': 'The White House',
-            '/Subject': 'Executive Order',
-            '/Keywords': 'executive order, white house, presidential action',
-            '/Creator': 'DocumentCloud Executive Orders Monitor',
-            '/Producer': 'DocumentCloud / ReportLab',
-            '/CreationDate': datetime.now().strftime('D:%Y%m%d%H%M%S'),
-            '/SourceURL': order_data.get('url', ''),
-        }
-        
-        if order_data.get('order_number'):
-            metadata['/Keywords'] += f", EO {order_data['order_number']}"
-        
-        writer.add_metadata(metadata)
-        
-        # Write to bytes
-        output_buffer = BytesIO()
-        writer.write(output_buffer)
-        output_buffer.seek(0)
-        return output_buffer.read()
\ No newline at end of file
+    def _separator(self) -> HRFlowable:
+        """Horizontal rule between the metadata, body and footer"""
+        return HRFlowable(width='100%', thickness=0.5, color=colors.grey, spaceBefore=6, spaceAfter=6)
\ No newline at end of file
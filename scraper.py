@@ -1,19 +1,127 @@
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from lxml import etree, html as lxml_html
 from datetime import datetime
+import codecs
+import functools
 import time
 import re
-from typing import List, Dict, Optional
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Dict, Optional, Tuple
 from urllib.parse import urljoin, urlparse
 
+
+def _has_class(name: str) -> str:
+    """XPath predicate matching elements that carry the given CSS class"""
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+
+# Selectors are compiled once at import time rather than per parse
+_ACTION_ITEMS = etree.XPath(f"//article[{_has_class('presidential-actions-listing__item')}]")
+_VIEW_CONTENT_ARTICLES = etree.XPath(f"(//div[{_has_class('view-content')}])[1]//article")
+_ITEM_TITLE = etree.XPath(
+    ".//*[self::h2 or self::h3 or self::h4]"
+    "[contains(@class, 'title') or contains(@class, 'heading')]"
+)
+_ITEM_ANCHOR = etree.XPath(".//a")
+_ITEM_LINK = etree.XPath(".//a[@href]")
+_ITEM_TIME = etree.XPath(".//time")
+_ITEM_DATE = etree.XPath(".//*[contains(@class, 'date') or contains(@class, 'time')]")
+_CONTENT_SELECTORS = [
+    etree.XPath(f"//div[{_has_class('body-content')}]"),
+    etree.XPath(f"//div[{_has_class('presidential-action-content')}]"),
+    etree.XPath("//main"),
+    etree.XPath("//article"),
+]
+_ISSUE_DATE_SELECTORS = [
+    etree.XPath(f"//div[{_has_class('presidential-action-date')}]"),
+    etree.XPath("//time"),
+]
+_CATEGORY_SELECTORS = [
+    etree.XPath(f"//a[{_has_class('category')}]"),
+    etree.XPath(f"//span[{_has_class('topic')}]"),
+]
+_TEXT_NODES = etree.XPath(
+    ".//text()[not(ancestor::script or ancestor::style or ancestor::template)]",
+    smart_strings=False
+)
+_EO_NUM_RE = re.compile(r'Executive Order (\d+)', re.IGNORECASE)
+_CHARSET_RE = re.compile(r'charset\s*=\s*["\']?([\w.:-]+)', re.IGNORECASE)
+_SLUG_DROP_RE = re.compile(r'[^\w\s-]')
+_SLUG_SEPARATOR_RE = re.compile(r'[-\s]+')
+
+
+def _first(selectors: List, node) -> Optional[object]:
+    """Return the first element matched by the first selector that matches"""
+    for selector in selectors:
+        matches = selector(node)
+        if matches:
+            return matches[0]
+    return None
+
+
+def _parse_html(html: bytes, encoding: Optional[str] = None):
+    """Parse page bytes, decoding them with the HTTP charset if one was sent"""
+    if encoding:
+        try:
+            codecs.lookup(encoding)
+        except LookupError:
+            print(f"Ignoring unknown charset: {encoding}")
+            encoding = None
+    
+    # Otherwise read valid UTF-8 as UTF-8, and leave anything else to
+    # lxml, which goes by the page's own <meta charset>
+    if not encoding:
+        try:
+            html.decode('utf-8')
+            encoding = 'utf-8'
+        except UnicodeDecodeError:
+            pass
+    
+    parser = lxml_html.HTMLParser(encoding=encoding) if encoding else None
+    return lxml_html.fromstring(html, parser=parser)
+
+
+def _element_text(elem, separator: str = '') -> str:
+    """Join an element's stripped, non-empty text nodes"""
+    return separator.join(
+        text for text in (node.strip() for node in _TEXT_NODES(elem)) if text
+    )
+
+
+class RateLimiter:
+    """Thread-safe limiter that spaces request starts evenly at `rate` per second"""
+    
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+    
+    def wait(self):
+        """Block until the caller's request slot comes up"""
+        with self._lock:
+            slot = max(time.monotonic(), self._next_slot)
+            self._next_slot = slot + self.interval
+        delay = slot - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+
 class WhiteHouseScraper:
     """Scraper for White House Presidential Actions page"""
     
     BASE_URL = "https://www.whitehouse.gov"
     ACTIONS_URL = f"{BASE_URL}/presidential-actions/"
     USER_AGENT = "DocumentCloud Executive Orders Monitor (+https://www.documentcloud.org)"
+    MAX_CONCURRENT_FETCHES = 8
+    FETCH_RATE = 1  # Order page requests per second
+    MAX_PAGE_BYTES = 8 * 1024 * 1024
+    CHUNK_SIZE = 64 * 1024
     
     def __init__(self):
+        self.rate_limiter = RateLimiter(self.FETCH_RATE)
         self.session = requests.Session()
         self.session.headers.update({
             'User-Agent': self.USER_AGENT,
@@ -24,67 +132,104 @@ class WhiteHouseScraper:
             'Connection': 'keep-alive',
             'Upgrade-Insecure-Requests': '1'
         })
+        
+        # Pooled keep-alive connections shared by all fetches, with
+        # urllib3 handling retries and exponential backoff
+        retry = Retry(
+            total=3,
+            backoff_factor=0.5,
+            status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods=['GET']
+        )
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=retry)
+        self.session.mount('https://', adapter)
     
-    def fetch_page(self, url: str, retries: int = 3) -> Optional[str]:
-        """Fetch a page with retry logic"""
-        for attempt in range(retries):
-            try:
-                response = self.session.get(url, timeout=30)
-                response.raise_for_status()
-                return response.text
-            except requests.RequestException as e:
-                if attempt == retries - 1:
-                    raise e
-                time.sleep(2 ** attempt)  # Exponential backoff
-        return None
+    def fetch_page_bytes(self, url: str, validators: Optional[Dict] = None) -> Optional[Tuple[bytes, Optional[str]]]:
+        """Fetch a page's raw bytes and Content-Type charset, retrying transient failures"""
+        # With a validators dict the request is conditional on its
+        # 'etag'/'last_modified' values and returns None when the page is
+        # unchanged (304); on a full response the dict is updated in place
+        headers = {}
+        if validators:
+            if validators.get('etag'):
+                headers['If-None-Match'] = validators['etag']
+            if validators.get('last_modified'):
+                headers['If-Modified-Since'] = validators['last_modified']
+        
+        with self.session.get(url, timeout=30, headers=headers, stream=True) as response:
+            if response.status_code == 304:
+                return None
+            response.raise_for_status()
+            
+            # Read the body in chunks so oversized pages fail early
+            chunks = []
+            total = 0
+            for chunk in response.iter_content(self.CHUNK_SIZE):
+                total += len(chunk)
+                if total > self.MAX_PAGE_BYTES:
+                    raise ValueError(f"Page too large: {url}")
+                chunks.append(chunk)
+            
+            if validators is not None:
+                validators.clear()
+                if response.headers.get('ETag'):
+                    validators['etag'] = response.headers['ETag']
+                if response.headers.get('Last-Modified'):
+                    validators['last_modified'] = response.headers['Last-Modified']
+            
+            # Left undecoded for lxml; unlike response.encoding, the charset
+            # is only taken from the header when it is actually given
+            charset_match = _CHARSET_RE.search(response.headers.get('Content-Type', ''))
+            return b''.join(chunks), charset_match.group(1) if charset_match else None
     
-    def parse_actions_page(self, html: str, include_proclamations: bool = False) -> List[Dict]:
+    def parse_actions_page(self, html: bytes, include_proclamations: bool = False,
+                           encoding: Optional[str] = None) -> List[Dict]:
         """Parse the presidential actions page to extract orders"""
-        soup = BeautifulSoup(html, 'lxml')
+        try:
+            tree = _parse_html(html, encoding)
+        except etree.ParserError:
+            # Blank or comment-only page
+            return []
         actions = []
         
         # Find all action items - adjust selectors based on actual page structure
         # These selectors may need to be updated based on the actual HTML
-        action_items = soup.find_all('article', class_='presidential-actions-listing__item')
+        action_items = _ACTION_ITEMS(tree)
         
         if not action_items:
             # Try alternative selectors
-            action_items = soup.find_all('div', class_='view-content')
-            if action_items:
-                action_items = action_items[0].find_all('article')
+            action_items = _VIEW_CONTENT_ARTICLES(tree)
         
         for item in action_items:
             try:
                 # Extract title
-                title_elem = item.find(['h2', 'h3', 'h4'], class_=re.compile('title|heading'))
-                if not title_elem:
-                    title_elem = item.find('a')
+                title_elem = _first([_ITEM_TITLE, _ITEM_ANCHOR], item)
                 
-                if not title_elem:
+                if title_elem is None:
                     continue
                 
-                title = title_elem.get_text(strip=True)
+                title = _element_text(title_elem)
                 
                 # Filter by type
-                if not include_proclamations and 'proclamation' in title.lower():
-                    continue
-                
-                if 'executive order' not in title.lower() and not include_proclamations:
-                    continue
+                title_lc = title.lower()
+                is_proclamation = 'proclamation' in title_lc
+                if not include_proclamations:
+                    if is_proclamation or 'executive order' not in title_lc:
+                        continue
                 
                 # Extract URL
-                link_elem = item.find('a', href=True)
-                if not link_elem:
+                link_elems = _ITEM_LINK(item)
+                if not link_elems:
                     continue
                 
-                url = urljoin(self.BASE_URL, link_elem['href'])
+                url = urljoin(self.BASE_URL, link_elems[0].get('href'))
                 
                 # Extract date
-                date_elem = item.find('time') or item.find(class_=re.compile('date|time'))
-                date_str = date_elem.get_text(strip=True) if date_elem else None
+                date_elem = _first([_ITEM_TIME, _ITEM_DATE], item)
+                date_str = _element_text(date_elem) if date_elem is not None else None
                 
                 # Extract order number if present
-                order_match = re.search(r'Executive Order (\d+)', title, re.IGNORECASE)
+                order_match = _EO_NUM_RE.search(title)
                 order_number = order_match.group(1) if order_match else None
                 
                 # Create unique ID
@@ -96,7 +241,7 @@ class WhiteHouseScraper:
                     'url': url,
                     'date_str': date_str,
                     'order_number': order_number,
-                    'type': 'proclamation' if 'proclamation' in title.lower() else 'executive_order'
+                    'type': 'proclamation' if is_proclamation else 'executive_order'
                 })
                 
             except Exception as e:
@@ -107,62 +252,75 @@ class WhiteHouseScraper:
     
     def fetch_order_content(self, url: str) -> Dict:
         """Fetch the full content of an executive order"""
-        html = self.fetch_page(url)
+        html, encoding = self.fetch_page_bytes(url)
         if not html:
             return {}
         
-        soup = BeautifulSoup(html, 'lxml')
+        try:
+            tree = _parse_html(html, encoding)
+        except etree.ParserError:
+            # Blank or comment-only page
+            return {}
         
         # Extract the main content
-        content_elem = soup.find('div', class_='body-content') or \
-                      soup.find('div', class_='presidential-action-content') or \
-                      soup.find('main') or \
-                      soup.find('article')
+        content_elem = _first(_CONTENT_SELECTORS, tree)
         
-        if not content_elem:
+        if content_elem is None:
             return {}
         
         # Extract text content
-        full_text = content_elem.get_text(separator='\n', strip=True)
+        full_text = _element_text(content_elem, separator='\n')
         
         # Extract any additional metadata
         metadata = {}
         
         # Try to find issue date
-        date_elem = soup.find('div', class_='presidential-action-date') or \
-                   soup.find('time')
-        if date_elem:
-            metadata['issue_date'] = date_elem.get_text(strip=True)
+        date_elem = _first(_ISSUE_DATE_SELECTORS, tree)
+        if date_elem is not None:
+            metadata['issue_date'] = _element_text(date_elem)
         
         # Try to find categories/topics
         categories = []
-        category_elems = soup.find_all('a', class_='category') or \
-                        soup.find_all('span', class_='topic')
+        category_elems = _CATEGORY_SELECTORS[0](tree) or _CATEGORY_SELECTORS[1](tree)
         for cat in category_elems:
-            categories.append(cat.get_text(strip=True))
+            categories.append(_element_text(cat))
         if categories:
             metadata['categories'] = categories
         
         return {
             'full_text': full_text,
-            'html_content': str(content_elem),
+            'html_content': lxml_html.tostring(content_elem, encoding='unicode', with_tail=False),
             'metadata': metadata
         }
     
-    def scrape_recent_orders(self, include_proclamations: bool = False) -> List[Dict]:
+    def scrape_recent_orders(self, include_proclamations: bool = False,
+                             validators: Optional[Dict] = None,
+                             is_known: Optional[Callable[[str], bool]] = None) -> List[Dict]:
         """Scrape recent executive orders from the White House website"""
         try:
-            html = self.fetch_page(self.ACTIONS_URL)
-            if not html:
+            # With cached validators an unchanged listing returns no orders
+            page = self.fetch_page_bytes(self.ACTIONS_URL, validators)
+            if page is None and validators:
+                print("Presidential actions page unchanged since last check")
+                return []
+            if not page or not page[0]:
                 raise Exception("Failed to fetch presidential actions page")
             
-            orders = self.parse_actions_page(html, include_proclamations)
+            html, encoding = page
+            orders = self.parse_actions_page(html, include_proclamations, encoding)
             
-            # Fetch full content for each order
-            for order in orders:
-                time.sleep(1)  # Rate limiting
-                content_data = self.fetch_order_content(order['url'])
-                order.update(content_data)
+            # Skip fetching content for orders that were already handled
+            if is_known:
+                orders = [order for order in orders if not is_known(order['id'])]
+            
+            # Fetch full content for each order concurrently
+            if orders:
+                workers = min(self.MAX_CONCURRENT_FETCHES, len(orders))
+                with ThreadPoolExecutor(max_workers=workers) as executor:
+                    results = executor.map(self._fetch_order_content_limited,
+                                           [order['url'] for order in orders])
+                    for order, content_data in zip(orders, results):
+                        order.update(content_data)
             
             return orders
             
@@ -170,7 +328,14 @@ class WhiteHouseScraper:
             print(f"Error scraping orders: {e}")
             raise
     
-    def _generate_order_id(self, url: str, title: str) -> str:
+    def _fetch_order_content_limited(self, url: str) -> Dict:
+        """Fetch order content once the rate limiter allows it"""
+        self.rate_limiter.wait()
+        return self.fetch_order_content(url)
+    
+    @staticmethod
+    @functools.lru_cache(maxsize=512)
+    def _generate_order_id(url: str, title: str) -> str:
         """Generate a unique ID for an order"""
         # Use URL path as primary identifier
         path = urlparse(url).path.strip('/')
@@ -178,6 +343,6 @@ class WhiteHouseScraper:
             return path.replace('/', '-')
         
         # Fallback to title-based ID
-        clean_title = re.sub(r'[^\w\s-]', '', title.lower())
-        clean_title = re.sub(r'[-\s]+', '-', clean_title)
+        clean_title = _SLUG_DROP_RE.sub('', title.lower())
+        clean_title = _SLUG_SEPARATOR_RE.sub('-', clean_title)
         return clean_title[:100]  # Limit length
\ No newline at end of file
@@ -1,126 +1,276 @@
+import functools
+import heapq
 import json
-from datetime import datetime
-from typing import Dict, List, Optional, Set
+import logging
+from collections import OrderedDict
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Set
+from dateutil import parser as date_parser
+from documentcloud.exceptions import APIError
+from requests.exceptions import RequestException
+
+logger = logging.getLogger(__name__)
+
+# Stored state format; 2.0 saves processed_orders as an ID -> date object
+# instead of a list of IDs
+STATE_VERSION = '2.0'
+
+_UTC = timezone.utc
+
+# How far before last_order_date get_new_orders keeps looking, for orders
+# that are published after newer ones
+LATE_POSTING_GRACE = timedelta(days=7)
+
+
+@functools.lru_cache(maxsize=256)
+def _parse_order_date(date_str: Optional[str]) -> Optional[date]:
+    """Parse a listing date such as 'January 20, 2025' to a calendar date"""
+    if not date_str:
+        return None
+    try:
+        # Dropping the time lets dates with and without a UTC offset compare
+        return date_parser.parse(date_str).date()
+    except (ValueError, OverflowError):
+        return None
+
 
 class StateManager:
     """Manage state for tracking processed executive orders"""
     
+    __slots__ = ('addon', 'state', '_dirty', '_last_check_dt', '_last_check_str')
+    
     def __init__(self, addon):
         """Initialize with DocumentCloud addon instance"""
         self.addon = addon
         self.state = self._load_state()
+        self._dirty = False
+        
+        # Parsed form of state['last_check'], reused while the string is unchanged
+        self._last_check_dt: Optional[datetime] = None
+        self._last_check_str: Optional[str] = None
     
     def _load_state(self) -> Dict:
         """Load state from DocumentCloud addon storage"""
         try:
             # DocumentCloud addons store state in the 'data' attribute
-            stored_state = self.addon.data.get('state', {})
-            
-            # Ensure all required fields exist
-            default_state = {
-                'last_check': None,
-                'processed_orders': [],
-                'posted_to_bluesky': [],
-                'last_order_date': None,
-                'version': '1.0'
-            }
-            
-            # Merge stored state with defaults
-            for key, value in default_state.items():
-                if key not in stored_state:
-                    stored_state[key] = value
-            
-            return stored_state
-            
-        except Exception as e:
-            print(f"Error loading state: {e}")
-            return {
-                'last_check': None,
-                'processed_orders': [],
-                'posted_to_bluesky': [],
-                'last_order_date': None,
-                'version': '1.0'
-            }
-    
-    def save_state(self):
+            stored_state = self.addon.data.get('state') or {}
+        except AttributeError:
+            logger.exception("Error loading state")
+            stored_state = {}
+        
+        # Ensure all required fields exist
+        default_state = {
+            'last_check': None,
+            'processed_orders': [],
+            'posted_to_bluesky': [],
+            'last_order_date': None,
+            'listing_cache': None,
+            'version': STATE_VERSION
+        }
+        
+        # Merge stored state with defaults
+        for key, value in default_state.items():
+            if key not in stored_state:
+                stored_state[key] = value
+        
+        # Processed orders map ID -> date processed, oldest first, so
+        # cleanup can evict from the front; entries saved before dates
+        # were recorded count as processed today
+        processed = stored_state['processed_orders']
+        if isinstance(processed, dict):
+            stored_state['processed_orders'] = OrderedDict(processed)
+        else:
+            stored_state['processed_orders'] = OrderedDict.fromkeys(processed, self._today())
+        
+        # Posted IDs are stored as a list but held as an insertion-ordered
+        # dict (ID -> None) for O(1) lookups
+        stored_state['posted_to_bluesky'] = dict.fromkeys(stored_state['posted_to_bluesky'])
+        
+        # Older formats are upgraded above and saved in the current one
+        stored_state['version'] = STATE_VERSION
+        
+        return stored_state
+    
+    def save_state(self, force: bool = False):
         """Save state to DocumentCloud addon storage"""
+        # Skip the round-trip unless something changed, so last_check
+        # records the last run that persisted something
+        if not self._dirty and not force:
+            return
+        
+        # Update last check time, keeping the parsed value cached
+        now = datetime.now(_UTC).replace(microsecond=0)
+        self._last_check_dt = now
+        self._last_check_str = now.isoformat()
+        self.state['last_check'] = self._last_check_str
+        
+        # Store state in addon data in JSON-friendly form
+        state = dict(self.state)
+        state['processed_orders'] = dict(self.state['processed_orders'])
+        state['posted_to_bluesky'] = list(self.state['posted_to_bluesky'])
+        self.addon.data['state'] = state
+        
+        # Persist to DocumentCloud
         try:
-            # Update last check time
-            self.state['last_check'] = datetime.utcnow().isoformat()
-            
-            # Store state in addon data
-            self.addon.data['state'] = self.state
-            
-            # Persist to DocumentCloud
             self.addon.save()
-            
-        except Exception as e:
-            print(f"Error saving state: {e}")
+        except (OSError, RequestException, APIError):
+            logger.exception("Error saving state")
             raise
+        self._dirty = False
+    
+    def flush(self):
+        """Save state to DocumentCloud even if nothing has changed"""
+        self.save_state(force=True)
     
     def is_order_processed(self, order_id: str) -> bool:
         """Check if an order has already been processed"""
-        return order_id in self.state.get('processed_orders', [])
+        return order_id in self.state['processed_orders']
     
     def mark_order_processed(self, order_id: str):
         """Mark an order as processed"""
-        if 'processed_orders' not in self.state:
-            self.state['processed_orders'] = []
-        
         if order_id not in self.state['processed_orders']:
-            self.state['processed_orders'].append(order_id)
+            self.state['processed_orders'][order_id] = self._today()
+            self._dirty = True
+    
+    def mark_orders_processed(self, order_ids: Iterable[str]):
+        """Mark several orders as processed at once"""
+        # Orders already processed keep their original date and position
+        processed = self.state['processed_orders']
+        today = self._today()
+        new_ids = {order_id: today for order_id in order_ids if order_id not in processed}
+        if new_ids:
+            processed.update(new_ids)
+            self._dirty = True
     
     def is_posted_to_bluesky(self, order_id: str) -> bool:
         """Check if an order has been posted to Bluesky"""
-        return order_id in self.state.get('posted_to_bluesky', [])
+        return order_id in self.state['posted_to_bluesky']
     
     def mark_posted_to_bluesky(self, order_id: str):
         """Mark an order as posted to Bluesky"""
-        if 'posted_to_bluesky' not in self.state:
-            self.state['posted_to_bluesky'] = []
-        
         if order_id not in self.state['posted_to_bluesky']:
-            self.state['posted_to_bluesky'].append(order_id)
+            self.state['posted_to_bluesky'][order_id] = None
+            self._dirty = True
+    
+    def mark_posted_to_bluesky_batch(self, order_ids: Iterable[str]):
+        """Mark several orders as posted to Bluesky at once"""
+        posted = self.state['posted_to_bluesky']
+        count = len(posted)
+        # Re-adding a key leaves its position unchanged
+        posted.update(dict.fromkeys(order_ids))
+        if len(posted) != count:
+            self._dirty = True
     
-    def get_new_orders(self, orders: List[Dict]) -> List[Dict]:
-        """Filter orders to only return new ones"""
-        processed_ids = set(self.state.get('processed_orders', []))
-        new_orders = []
+    def get_new_orders(self, orders: List[Dict], limit: Optional[int] = None) -> List[Dict]:
+        """Filter orders to only return new ones, newest first"""
+        # Orders come newest first, as the listing shows them, so scanning
+        # stops at the first one dated well before last_order_date (allowing
+        # LATE_POSTING_GRACE for orders published out of order)
+        processed_ids = self.state['processed_orders']
+        cutoff = _parse_order_date(self.state['last_order_date'])
+        if cutoff:
+            cutoff -= LATE_POSTING_GRACE
         
-        for order in orders:
-            if order['id'] not in processed_ids:
-                new_orders.append(order)
+        def candidates():
+            for order in orders:
+                if cutoff:
+                    order_date = _parse_order_date(order.get('date_str'))
+                    if order_date and order_date < cutoff:
+                        break
+                if order['id'] not in processed_ids:
+                    yield order
         
         # Sort by date if available (newest first)
-        new_orders.sort(key=lambda x: x.get('date_str', ''), reverse=True)
+        def sort_key(order):
+            return _parse_order_date(order.get('date_str')) or date.min
         
-        return new_orders
+        # With a limit, only the newest `limit` new orders are returned
+        if limit is not None:
+            return heapq.nlargest(limit, candidates(), key=sort_key)
+        return sorted(candidates(), key=sort_key, reverse=True)
     
-    def update_last_order_date(self, date_str: str):
+    def update_last_order_date(self, date_str: Optional[str]):
         """Update the date of the most recent order processed"""
-        self.state['last_order_date'] = date_str
+        # Only moves forward; dates that can't be parsed are ignored
+        order_date = _parse_order_date(date_str)
+        if not order_date:
+            return
+        
+        current = _parse_order_date(self.state['last_order_date'])
+        if current is None or order_date > current:
+            self.state['last_order_date'] = date_str
+            self._dirty = True
+    
+    def get_listing_validators(self, include_proclamations: bool) -> Dict:
+        """Get the cached ETag/Last-Modified of the presidential actions page"""
+        # Validators recorded with a different proclamations setting don't
+        # apply, since that run filtered the listing differently
+        cache = self.state['listing_cache'] or {}
+        if cache.get('include_proclamations') != include_proclamations:
+            return {}
+        return {key: cache[key] for key in ('etag', 'last_modified') if cache.get(key)}
+    
+    def set_listing_validators(self, validators: Dict, include_proclamations: bool):
+        """Remember the presidential actions page validators for the next run"""
+        cache = dict(validators, include_proclamations=include_proclamations)
+        if self.state['listing_cache'] != cache:
+            self.state['listing_cache'] = cache
+            self._dirty = True
     
     def get_last_check(self) -> Optional[datetime]:
         """Get the last check timestamp"""
-        last_check = self.state.get('last_check')
+        last_check = self.state['last_check']
+        if last_check and last_check == self._last_check_str:
+            return self._last_check_dt
         if last_check:
             try:
-                return datetime.fromisoformat(last_check)
-            except:
+                last_check_dt = datetime.fromisoformat(last_check)
+                if last_check_dt.tzinfo is None:
+                    # Saved before timestamps carried an offset; they were UTC
+                    last_check_dt = last_check_dt.replace(tzinfo=_UTC)
+                self._last_check_dt = last_check_dt
+                self._last_check_str = last_check
+                return self._last_check_dt
+            except ValueError:
                 return None
         return None
     
-    def cleanup_old_entries(self, days_to_keep: int = 90):
+    def cleanup_old_entries(self, days_to_keep: int = 90, max_entries: int = 5000,
+                            keep_ids: Iterable[str] = ()):
         """Clean up old entries to prevent state from growing too large"""
-        # For now, we'll keep all entries as they're just IDs
-        # In the future, we might want to implement a more sophisticated cleanup
-        pass
+        processed = self.state['processed_orders']
+        posted = self.state['posted_to_bluesky']
+        cutoff = (datetime.now(_UTC) - timedelta(days=days_to_keep)).date().isoformat()
+        
+        # Entries are oldest first, so stop at the first one that is neither
+        # expired nor over max_entries; orders still on the listing (keep_ids)
+        # are never forgotten, or they would be processed again
+        keep_ids = set(keep_ids)
+        excess = len(processed) - max_entries
+        evicted = []
+        for order_id, processed_on in processed.items():
+            if excess <= 0 and processed_on >= cutoff:
+                break
+            if order_id not in keep_ids:
+                evicted.append(order_id)
+                excess -= 1
+        
+        for order_id in evicted:
+            del processed[order_id]
+            posted.pop(order_id, None)
+        if evicted:
+            self._dirty = True
+    
+    @staticmethod
+    def _today() -> str:
+        """Today's date as stored against processed orders"""
+        return datetime.now(_UTC).date().isoformat()
     
     def get_stats(self) -> Dict:
         """Get statistics about processed orders"""
         return {
-            'total_processed': len(self.state.get('processed_orders', [])),
-            'total_posted': len(self.state.get('posted_to_bluesky', [])),
-            'last_check': self.state.get('last_check'),
-            'last_order_date': self.state.get('last_order_date')
+            'total_processed': len(self.state['processed_orders']),
+            'total_posted': len(self.state['posted_to_bluesky']),
+            'last_check': self.state['last_check'],
+            'last_order_date': self.state['last_order_date']
         }
\ No newline at end of file